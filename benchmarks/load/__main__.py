@@ -0,0 +1,132 @@
+"""
+Load testing harness for the bots against local fakes of Telegram, Redis, MySQL and Gmail.
+
+Every scenario runs in a fresh interpreter, so max_rss_mb is its own peak and not one inherited from
+a scenario run before it.
+
+Usage: python -m benchmarks.load [scenario ...] [--operations N] [--concurrency N] [--trace-memory] [--save-baseline]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+
+from benchmarks.load.scenarios import SCENARIOS, run_scenario
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+DEFAULT_OPERATIONS = {
+    'lifestat': 2000,
+    'operator_helper': 500,
+    'neural_signal': 100,
+}
+# Baselines measured on another interpreter or hardware say nothing about this run
+COMPARED_ENVIRONMENT_KEYS = ('python', 'machine', 'cpu_count')
+
+
+def get_environment() -> Dict[str, Any]:
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def get_environment_mismatch(baselines: Dict[str, Dict[str, Any]]) -> List[str]:
+    recorded = baselines.get('environment', {})
+    current = get_environment()
+    return [
+        f'{key} {recorded.get(key)} (baseline) != {current[key]}'
+        for key in COMPARED_ENVIRONMENT_KEYS if recorded.get(key) != current[key]
+    ]
+
+
+def run_in_subprocess(*args) -> Dict[str, Any]:
+    # spawn starts a clean interpreter, a fork would share the parent's memory high-water mark
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(run_scenario, *args).result()
+
+
+def load_baselines() -> Dict[str, Dict[str, Any]]:
+    if not os.path.exists(BASELINES_PATH):
+        return {}
+    with open(BASELINES_PATH) as baselines_file:
+        return json.load(baselines_file)
+
+
+def compare(name: str, summary: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    if summary['throughput_ops'] < baseline['throughput_ops'] * (1 - tolerance):
+        regressions.append(
+            f"{name}: throughput {summary['throughput_ops']} ops/s, baseline {baseline['throughput_ops']} ops/s"
+        )
+    if summary['latency_p95_ms'] > baseline['latency_p95_ms'] * (1 + tolerance):
+        regressions.append(
+            f"{name}: p95 latency {summary['latency_p95_ms']} ms, baseline {baseline['latency_p95_ms']} ms"
+        )
+    if summary['errors'] > baseline['errors']:
+        regressions.append(f"{name}: {summary['errors']} errors, baseline {baseline['errors']}")
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.load', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('scenarios', nargs='*', help=f'any of {", ".join(sorted(SCENARIOS))}, all by default')
+    parser.add_argument('--operations', type=int, help='updates or newsletters per scenario')
+    parser.add_argument('--concurrency', type=int, default=10,
+                        help='updates processed at once, for neural_signal the number of channels')
+    parser.add_argument('--flood-every', type=int, default=0,
+                        help='answer every n-th Telegram call with a 429 flood control error')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='run every scenario once more under tracemalloc to report peak traced memory')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed regression against the baseline')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    args = parser.parse_args(argv)
+    unknown_scenarios = set(args.scenarios) - set(SCENARIOS)
+    if unknown_scenarios:
+        parser.error(f'unknown scenarios: {", ".join(sorted(unknown_scenarios))}')
+
+    baselines = load_baselines()
+    environment_mismatch = get_environment_mismatch(baselines) if baselines and not args.save_baseline else []
+    if environment_mismatch:
+        print(f'Warning: baselines were recorded on another host ({", ".join(environment_mismatch)}), '
+              f'comparison is skipped, run with --save-baseline to record baselines for this host')
+    regressions = []
+    for name in args.scenarios or sorted(SCENARIOS):
+        operations = args.operations or DEFAULT_OPERATIONS[name]
+        summary = run_in_subprocess(name, operations, args.concurrency, args.flood_every)
+        if args.trace_memory:
+            # Timings come from the untraced run, tracemalloc overhead would skew them
+            traced_summary = run_in_subprocess(name, operations, args.concurrency, args.flood_every, True)
+            summary['peak_traced_memory_mb'] = traced_summary['peak_traced_memory_mb']
+        print(name)
+        for key, value in summary.items():
+            print(f'  {key:<24} {value}')
+
+        if args.save_baseline:
+            baselines[name] = summary
+        elif environment_mismatch:
+            continue
+        elif name in baselines:
+            regressions.extend(compare(name, summary, baselines[name], args.tolerance))
+        else:
+            print('  no baseline stored, run with --save-baseline')
+
+    if args.save_baseline:
+        baselines['environment'] = get_environment()
+        with open(BASELINES_PATH, 'w') as baselines_file:
+            json.dump(baselines, baselines_file, indent=4, ensure_ascii=False)
+            baselines_file.write('\n')
+    for regression in regressions:
+        print(f'Regression: {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""
+Local fake of the Telegram Bot API, enough for the bots in this repo.
+Both aiogram and python-telegram-bot can be pointed at it with a custom API server url.
+"""
+import json
+import threading
+import time
+from collections import Counter
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot'}
+
+
+def message_update(update_id: int, chat_id: int, user_id: int, text: str, message_id: int = 1) -> Dict[str, Any]:
+    message = {
+        'message_id': message_id,
+        'date': int(time.time()),
+        'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'supergroup', 'title': 'chat'},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': 'User', 'username': f'user{user_id}'},
+        'text': text,
+    }
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split(' ')[0])}]
+    return {'update_id': update_id, 'message': message}
+
+
+def callback_query_update(update_id: int, user_id: int, message_id: int, data: str) -> Dict[str, Any]:
+    user = {'id': user_id, 'is_bot': False, 'first_name': 'User', 'username': f'user{user_id}'}
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id),
+            'from': user,
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': BOT_USER,
+                'text': 'counters',
+            },
+        },
+    }
+
+
+def channel_post_update(update_id: int, chat_id: int, username: str) -> Dict[str, Any]:
+    return {
+        'update_id': update_id,
+        'channel_post': {
+            'message_id': 1,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'channel', 'title': username, 'username': username},
+            'text': 'post',
+        },
+    }
+
+
+class FakeTelegramServer:
+    """
+    Serves ``/bot<token>/<method>`` from a background thread and records every call.
+    With ``retry_after_every`` set, every n-th call is answered with a 429 flood control error
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, retry_after_every: int = 0, retry_after: int = 1):
+        self.retry_after_every = retry_after_every
+        self.retry_after = retry_after
+        self.updates: List[Dict[str, Any]] = []
+        self.calls = Counter()
+        self.uploaded_bytes = 0
+        self.webhook_url = ''
+        self.lock = threading.Lock()
+        self.message_id = 0
+        self.file_id = 0
+        self.request_count = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                self.handle_api_call()
+
+            def do_POST(self):
+                self.handle_api_call()
+
+            def handle_api_call(self):
+                url = urlsplit(self.path)
+                parts = url.path.strip('/').split('/')
+                if len(parts) != 2 or not parts[0].startswith('bot'):
+                    self.send_json(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+                    return
+                params = dict(parse_qsl(url.query))
+                params.update(self.read_params())
+                status, payload = server.dispatch(parts[1], params)
+                self.send_json(status, payload)
+
+            def read_params(self) -> Dict[str, Any]:
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                content_type = self.headers.get('Content-Type', '')
+                if not body:
+                    return {}
+                if content_type.startswith('application/json'):
+                    return json.loads(body)
+                if content_type.startswith('multipart/form-data'):
+                    message = BytesParser(policy=HTTP).parsebytes(
+                        f'Content-Type: {content_type}\r\n\r\n'.encode() + body
+                    )
+                    params = {}
+                    for part in message.iter_parts():
+                        name = part.get_param('name', header='content-disposition')
+                        content = part.get_payload(decode=True)
+                        params[name] = content if part.get_filename() else content.decode()
+                    return params
+                return dict(parse_qsl(body.decode()))
+
+            def send_json(self, status: int, payload: Dict[str, Any]):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.http_server = ThreadingHTTPServer((host, port), Handler)
+        self.http_server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.http_server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def base_url(self) -> str:
+        """Base url in python-telegram-bot format, the token is appended to it"""
+        return f'{self.url}/bot'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.http_server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.http_server.shutdown()
+        self.http_server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def add_update(self, update: Dict[str, Any]):
+        with self.lock:
+            self.updates.append(update)
+
+    def get_message(self, chat_id: Any, **fields) -> Dict[str, Any]:
+        with self.lock:
+            self.message_id += 1
+            message_id = self.message_id
+        chat_id = int(chat_id)
+        message = {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'channel'},
+            'from': BOT_USER,
+        }
+        message.update(fields)
+        return message
+
+    def dispatch(self, method: str, params: Dict[str, Any]):
+        with self.lock:
+            self.calls[method] += 1
+            self.request_count += 1
+            flood = self.retry_after_every and self.request_count % self.retry_after_every == 0
+        if flood:
+            return 429, {
+                'ok': False,
+                'error_code': 429,
+                'description': f'Too Many Requests: retry after {self.retry_after}',
+                'parameters': {'retry_after': self.retry_after},
+            }
+
+        handler = getattr(self, f'api_{method.lower()}', None)
+        if handler is None:
+            return 404, {'ok': False, 'error_code': 404, 'description': 'Not Found: method not found'}
+        return 200, {'ok': True, 'result': handler(params)}
+
+    def api_getme(self, params: Dict[str, Any]):
+        return BOT_USER
+
+    def api_getupdates(self, params: Dict[str, Any]):
+        offset = int(params.get('offset') or 0)
+        with self.lock:
+            if offset:
+                self.updates = [u for u in self.updates if u['update_id'] >= offset]
+            return list(self.updates[:int(params.get('limit') or 100)])
+
+    def api_setwebhook(self, params: Dict[str, Any]):
+        self.webhook_url = params.get('url', '')
+        return True
+
+    def api_deletewebhook(self, params: Dict[str, Any]):
+        self.webhook_url = ''
+        return True
+
+    def api_getwebhookinfo(self, params: Dict[str, Any]):
+        return {'url': self.webhook_url, 'has_custom_certificate': False, 'pending_update_count': len(self.updates)}
+
+    def api_sendmessage(self, params: Dict[str, Any]):
+        return self.get_message(params['chat_id'], text=params.get('text', ''))
+
+    def api_editmessagetext(self, params: Dict[str, Any]):
+        return self.get_message(params.get('chat_id') or 0, text=params.get('text', ''))
+
+    def api_answercallbackquery(self, params: Dict[str, Any]):
+        return True
+
+    def api_sendaudio(self, params: Dict[str, Any]):
+        audio = params['audio']
+        if isinstance(audio, bytes):
+            with self.lock:
+                self.file_id += 1
+                self.uploaded_bytes += len(audio)
+                file_id = f'audio-{self.file_id}'
+            size = len(audio)
+        else:
+            file_id = audio
+            size = 0
+        return self.get_message(
+            params['chat_id'],
+            caption=params.get('caption', ''),
+            audio={
+                'file_id': file_id,
+                'file_unique_id': file_id,
+                'duration': 0,
+                'title': params.get('title', ''),
+                'file_size': size,
+            }
+        )
@@ -0,0 +1,64 @@
+import json
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+BILLINGS = ('monetix', 'expay', 'octopays', 'swiffy')
+STATUSES = ('success', 'success', 'success', 'cancel', 'pending')
+PID_SCHEMAS = {
+    'monetix': lambda pid: {'operation': {'id': pid}},
+    'expay': lambda pid: {'refer': pid},
+    'octopays': lambda pid: {'data': {'internal_id': pid}},
+    'swiffy': lambda pid: {'callpay_transaction_id': pid},
+}
+
+
+def seed_operator_database(path: str, methods_per_billing: int = 5, transactions: int = 20_000, seed: int = 0):
+    """SQLite copy of the PaymentMethods and z_gotobill tables used by OperatorHelperBot"""
+    rnd = random.Random(seed)
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.executescript('''
+        DROP TABLE IF EXISTS PaymentMethods;
+        DROP TABLE IF EXISTS z_gotobill;
+        CREATE TABLE PaymentMethods (
+            id INTEGER PRIMARY KEY,
+            billing TEXT,
+            name TEXT,
+            active INTEGER,
+            is_temporarily_down INTEGER
+        );
+        CREATE TABLE z_gotobill (
+            id INTEGER PRIMARY KEY,
+            dt TEXT,
+            pay_method_id INTEGER,
+            status TEXT,
+            cancel_reason_code TEXT,
+            response TEXT
+        );
+        CREATE INDEX z_gotobill_pay_method_id_dt ON z_gotobill (pay_method_id, dt);
+        ''')
+        methods = []
+        for billing in BILLINGS:
+            for _ in range(methods_per_billing):
+                method_id = len(methods) + 1
+                methods.append((method_id, billing, f'{billing}_{method_id}', 1, rnd.random() < 0.1))
+        connection.executemany('INSERT INTO PaymentMethods VALUES (?, ?, ?, ?, ?)', methods)
+
+        now = datetime.utcnow()
+        rows = []
+        for transaction_id in range(1, transactions + 1):
+            method_id, billing = rnd.choice(methods)[:2]
+            status = rnd.choice(STATUSES)
+            dt = now - timedelta(seconds=rnd.randint(0, 72 * 3600))
+            rows.append((
+                transaction_id,
+                dt.strftime('%Y-%m-%d %H:%M:%S'),
+                method_id,
+                status,
+                str(rnd.randint(1, 20)) if status == 'cancel' else None,
+                json.dumps(PID_SCHEMAS[billing](f'pid-{transaction_id}')),
+            ))
+        connection.executemany('INSERT INTO z_gotobill VALUES (?, ?, ?, ?, ?, ?)', rows)
+    connection.close()
+    return [method[0] for method in methods]
@@ -0,0 +1,240 @@
+"""
+Minimal local IMAP4rev1 server over plain TCP, enough for GmailClient:
+LOGIN, SELECT, UID SEARCH, UID FETCH (RFC822, BODYSTRUCTURE, BODY[...] sections) and UID STORE.
+"""
+import email
+import email.utils
+import imaplib
+import re
+import socketserver
+import threading
+from dataclasses import dataclass, field
+from email.message import Message
+from functools import cached_property
+from typing import List, Optional, Set
+
+from lib.gmail_client import GmailClient
+
+COMMAND_EXPRESSION = re.compile(r'^(\S+) (?:UID )?(\S+) ?(.*)$', re.IGNORECASE)
+SECTION_EXPRESSION = re.compile(r'BODY(?:\.PEEK)?\[([^\]]*)\]|RFC822|BODYSTRUCTURE|UID|FLAGS', re.IGNORECASE)
+
+
+@dataclass
+class StoredMessage:
+    uid: int
+    raw: bytes
+    sender: str
+    flags: Set[str] = field(default_factory=set)
+
+    @cached_property
+    def message(self) -> Message:
+        return email.message_from_bytes(self.raw)
+
+
+def quote(value: Optional[str]) -> str:
+    if value is None:
+        return 'NIL'
+    return '"{}"'.format(value.replace('\\', '\\\\').replace('"', '\\"'))
+
+
+def get_bodystructure(part: Message) -> str:
+    if part.is_multipart():
+        children = ''.join(get_bodystructure(child) for child in part.get_payload())
+        return f'({children} {quote(part.get_content_subtype().upper())})'
+    maintype, subtype = part.get_content_maintype(), part.get_content_subtype()
+    charset = part.get_content_charset()
+    parameters = f'({quote("CHARSET")} {quote(charset)})' if charset else 'NIL'
+    encoding = part.get('Content-Transfer-Encoding', '7BIT').upper()
+    payload = part.get_payload()
+    structure = f'{quote(maintype.upper())} {quote(subtype.upper())} {parameters} NIL NIL {quote(encoding)} {len(payload)}'
+    if maintype == 'text':
+        structure += f' {payload.count(chr(10))}'
+    return f'({structure})'
+
+
+def get_part(message: Message, section: str) -> Message:
+    part = message
+    for number in section.split('.'):
+        part = part.get_payload()[int(number) - 1]
+    return part
+
+
+def get_section(stored: StoredMessage, section: str) -> bytes:
+    raw = stored.raw
+    header_end = raw.find(b'\r\n\r\n') + 4
+    section_upper = section.upper()
+    if section == '':
+        return raw
+    if section_upper.startswith('HEADER.FIELDS'):
+        names = section_upper[section_upper.index('(') + 1:section_upper.index(')')].split()
+        message = stored.message
+        lines = [f'{name.title()}: {message[name]}' for name in names if message[name] is not None]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode()
+    if section_upper == 'HEADER':
+        return raw[:header_end]
+    if section_upper == 'TEXT':
+        return raw[header_end:]
+    if section_upper.endswith('.MIME'):
+        part = get_part(stored.message, section[:-5])
+        headers = ''.join(f'{name}: {value}\r\n' for name, value in part.items())
+        return (headers + '\r\n').encode()
+    part = get_part(stored.message, section)
+    payload = part.get_payload()
+    if isinstance(payload, list):
+        return part.as_bytes()
+    return payload.encode()
+
+
+class ImapStub:
+    """
+    Serves the given messages from a background thread.
+    ``commands`` and ``sent_bytes`` count client round-trips and the bytes sent to the client
+    """
+
+    def __init__(self, username: str = 'user', password: str = 'password', host: str = '127.0.0.1', port: int = 0):
+        self.username = username
+        self.password = password
+        self.messages: List[StoredMessage] = []
+        self.commands = 0
+        self.sent_bytes = 0
+        self.lock = threading.Lock()
+
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+
+            def send(self, data: bytes):
+                with stub.lock:
+                    stub.sent_bytes += len(data)
+                self.wfile.write(data)
+
+            def handle(self):
+                self.send(b'* OK IMAP4rev1 stub ready\r\n')
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    match = COMMAND_EXPRESSION.match(line.decode().rstrip('\r\n'))
+                    if not match:
+                        self.send(b'* BAD unknown command\r\n')
+                        continue
+                    with stub.lock:
+                        stub.commands += 1
+                    tag, command, arguments = match.groups()
+                    command = command.upper()
+                    if command == 'LOGOUT':
+                        self.send(b'* BYE\r\n' + f'{tag} OK LOGOUT completed\r\n'.encode())
+                        return
+                    response = stub.handle_command(command, arguments)
+                    if response is None:
+                        self.send(f'{tag} BAD unsupported command\r\n'.encode())
+                    else:
+                        self.send(response + f'{tag} OK {command} completed\r\n'.encode())
+
+        self.tcp_server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.tcp_server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self):
+        return self.tcp_server.server_address[:2]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.tcp_server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.tcp_server.shutdown()
+        self.tcp_server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def add_message(self, raw: bytes):
+        sender = email.utils.parseaddr(email.message_from_bytes(raw)['From'])[1]
+        self.messages.append(StoredMessage(uid=len(self.messages) + 1, raw=raw, sender=sender))
+
+    def select_messages(self, message_set: str) -> List[StoredMessage]:
+        uids = set()
+        for item in message_set.split(','):
+            start, _, end = item.partition(':')
+            last = len(self.messages) if end == '*' else int(end or start)
+            uids.update(range(int(start), last + 1))
+        return [m for m in self.messages if m.uid in uids]
+
+    def handle_command(self, command: str, arguments: str) -> Optional[bytes]:
+        if command in ('CAPABILITY', 'NOOP'):
+            return b'* CAPABILITY IMAP4rev1\r\n' if command == 'CAPABILITY' else b''
+        if command == 'LOGIN':
+            return b''
+        if command in ('SELECT', 'EXAMINE'):
+            return f'* {len(self.messages)} EXISTS\r\n* 0 RECENT\r\n'.encode()
+        if command == 'SEARCH':
+            return self.search(arguments)
+        if command == 'FETCH':
+            message_set, _, items = arguments.partition(' ')
+            return self.fetch(message_set, items)
+        if command == 'STORE':
+            message_set, _, flags = arguments.partition(' ')
+            return self.store(message_set, flags)
+        return None
+
+    def search(self, arguments: str) -> bytes:
+        unseen = 'UNSEEN' in arguments.upper()
+        sender_match = re.search(r'FROM "([^"]*)"', arguments, re.IGNORECASE)
+        sender = sender_match.group(1) if sender_match else None
+        uids = [
+            str(m.uid) for m in self.messages
+            if (not unseen or '\\Seen' not in m.flags) and (sender is None or m.sender == sender)
+        ]
+        return f'* SEARCH {" ".join(uids)}\r\n'.encode()
+
+    def fetch(self, message_set: str, items: str) -> bytes:
+        response = b''
+        for stored in self.select_messages(message_set):
+            sequence_number = self.messages.index(stored) + 1
+            response_items = []
+            for item in SECTION_EXPRESSION.finditer(items):
+                name = item.group(0).upper()
+                if name == 'UID':
+                    response_items.append(f'UID {stored.uid}'.encode())
+                elif name == 'FLAGS':
+                    response_items.append(f'FLAGS ({" ".join(sorted(stored.flags))})'.encode())
+                elif name == 'BODYSTRUCTURE':
+                    response_items.append(f'BODYSTRUCTURE {get_bodystructure(stored.message)}'.encode())
+                else:
+                    section = '' if name == 'RFC822' else item.group(1)
+                    data = get_section(stored, section)
+                    label = 'RFC822' if name == 'RFC822' else f'BODY[{section}]'
+                    response_items.append(f'{label} {{{len(data)}}}\r\n'.encode() + data)
+                    if name == 'RFC822' or not name.startswith('BODY.PEEK'):
+                        stored.flags.add('\\Seen')
+            response += f'* {sequence_number} FETCH ('.encode() + b' '.join(response_items) + b')\r\n'
+        return response
+
+    def store(self, message_set: str, flags: str) -> bytes:
+        response = b''
+        for stored in self.select_messages(message_set):
+            if flags.upper().startswith('+FLAGS') and '\\Seen' in flags:
+                stored.flags.add('\\Seen')
+            sequence_number = self.messages.index(stored) + 1
+            response += f'* {sequence_number} FETCH (UID {stored.uid} FLAGS ({" ".join(sorted(stored.flags))}))\r\n'.encode()
+        return response
+
+
+class StubGmailClient(GmailClient):
+    """GmailClient connected to an ImapStub over plain IMAP"""
+
+    def __init__(self, stub: ImapStub, batch_size: int = 50):
+        self.stub = stub
+        super().__init__(username=stub.username, password=stub.password, batch_size=batch_size)
+
+    def get_connection(self):
+        connection = imaplib.IMAP4(*self.stub.address)
+        connection.login(self.email, self.password)
+        connection.select('Inbox')
+        return connection
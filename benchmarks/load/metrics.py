@@ -0,0 +1,66 @@
+import resource
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+def percentile(values: List[float], rank: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(rank / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    duration: float = 0.0
+    peak_memory: Optional[int] = None
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    def summary(self) -> Dict[str, Any]:
+        operations = len(self.latencies)
+        result = {
+            'operations': operations,
+            'errors': self.errors,
+            'duration_s': round(self.duration, 3),
+            'throughput_ops': round(operations / self.duration, 1) if self.duration else 0.0,
+            'latency_p50_ms': round(percentile(self.latencies, 50) * 1000, 2),
+            'latency_p95_ms': round(percentile(self.latencies, 95) * 1000, 2),
+            'latency_p99_ms': round(percentile(self.latencies, 99) * 1000, 2),
+            # High-water mark of the whole process, only meaningful with one scenario per process
+            'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+        if self.peak_memory is not None:
+            result['peak_traced_memory_mb'] = round(self.peak_memory / 2 ** 20, 2)
+        result.update(self.extra)
+        return result
+
+
+class Measurement:
+    """
+    Context manager that times the whole scenario.
+    With ``trace_memory`` it also traces peak memory, tracemalloc slows down every allocation,
+    so timings of a traced run are not comparable with untraced ones
+    """
+
+    def __init__(self, result: ScenarioResult, trace_memory: bool = False):
+        self.result = result
+        self.trace_memory = trace_memory
+        self.started = 0.0
+
+    def __enter__(self) -> ScenarioResult:
+        if self.trace_memory:
+            tracemalloc.start()
+        self.started = time.perf_counter()
+        return self.result
+
+    def __exit__(self, *args):
+        self.result.duration = time.perf_counter() - self.started
+        if self.trace_memory:
+            self.result.peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
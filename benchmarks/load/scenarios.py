@@ -0,0 +1,254 @@
+"""
+Load scenarios, every bot talks to local fakes only:
+FakeTelegramServer for the Bot API, fakeredis for LifeStat state, SQLite for the operator database
+and ImapStub for the newsletters mailbox.
+"""
+import asyncio
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.load.fake_telegram import FakeTelegramServer, callback_query_update, channel_post_update, message_update
+from benchmarks.load.fixtures import seed_operator_database
+from benchmarks.load.imap_stub import ImapStub, StubGmailClient
+from benchmarks.load.metrics import Measurement, ScenarioResult
+from benchmarks.newsletters import build_newsletter
+
+# Format check only, the fake server accepts any token
+FAKE_TOKEN = '123456789:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA'
+OPERATORS_CHAT_ID = -100500
+MYSQL_INTERVAL_EXPRESSION = re.compile(r'now\(\) - INTERVAL (\d+) (\w+)', re.IGNORECASE)
+
+
+async def process_updates(dispatcher, updates: List[Dict[str, Any]], concurrency: int, result: ScenarioResult):
+    """Feed updates to an aiogram dispatcher like polling does, at most ``concurrency`` at once"""
+    from aiogram import types
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def process(update: Dict[str, Any]):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await dispatcher.process_update(types.Update.to_object(update))
+            except Exception:
+                result.errors += 1
+            result.latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(process(update) for update in updates))
+
+
+def use_fake_server(aiogram_bot, server: FakeTelegramServer):
+    from aiogram import Bot, Dispatcher
+    from aiogram.bot.api import TelegramAPIServer
+
+    aiogram_bot.bot.server = TelegramAPIServer.from_base(server.url)
+    Bot.set_current(aiogram_bot.bot)
+    Dispatcher.set_current(aiogram_bot.dp)
+
+
+def new_event_loop():
+    """aiogram bots take the current loop at construction, asyncio.run of a previous scenario unsets it"""
+    asyncio.set_event_loop(asyncio.new_event_loop())
+
+
+async def close_session(aiogram_bot):
+    session = await aiogram_bot.bot.get_session()
+    await session.close()
+
+
+def lifestat_tap_storm(operations: int, concurrency: int, flood_every: int = 0,
+                       trace_memory: bool = False) -> ScenarioResult:
+    """Users tapping "+" on their counters, several taps per user are in flight at the same time"""
+    from aiogram.contrib.fsm_storage.memory import MemoryStorage
+    from fakeredis.aioredis import FakeRedis
+
+    os.environ['TELEGRAM_API_TOKEN'] = FAKE_TOKEN
+    from lifestat_bot import Counter, LifeStatBot, UserState
+
+    users = max(1, operations // 50)
+    taps_per_user = max(1, operations // users)
+    result = ScenarioResult('lifestat_tap_storm')
+
+    new_event_loop()
+    with FakeTelegramServer(retry_after_every=flood_every) as server:
+        bot = LifeStatBot()
+        bot.app_data.storage = FakeRedis()
+        # FSM state lives in memory, the counters are kept in fakeredis
+        bot.dp.storage = MemoryStorage()
+        bot.register_handlers()
+        use_fake_server(bot, server)
+
+        async def scenario():
+            for user_id in range(1, users + 1):
+                state = UserState(user_id, f'user{user_id}', {'water': Counter('water', 0)})
+                await bot.app_data.set_user_state(user_id, state)
+            updates = []
+            for tap in range(taps_per_user):
+                for user_id in range(1, users + 1):
+                    data = bot.counter_cb.new(counter_name='water', action='+', value=0)
+                    updates.append(callback_query_update(len(updates) + 1, user_id, 1, data))
+
+            with Measurement(result, trace_memory):
+                await process_updates(bot.dp, updates, concurrency, result)
+
+            counted = 0
+            for user_id in range(1, users + 1):
+                counted += (await bot.app_data.get_user_state(user_id)).counters['water'].value
+            result.extra['lost_increments'] = len(updates) - counted
+            result.extra['edit_message_calls'] = server.calls['editMessageText']
+            await close_session(bot)
+
+        bot.loop.run_until_complete(scenario())
+    return result
+
+
+def operator_command_burst(operations: int, concurrency: int, flood_every: int = 0,
+                           trace_memory: bool = False) -> ScenarioResult:
+    """Operators sending report commands to OperatorHelperBot in the operators chat"""
+    os.environ['OPERATOR_HELPER_BOT_TOKEN'] = FAKE_TOKEN
+    os.environ['OPERATOR_HELPER_CHANNEL_ID'] = str(OPERATORS_CHAT_ID)
+    from operator_helper_bot import OperatorHelperBot
+
+    class SqliteOperatorHelperBot(OperatorHelperBot):
+
+        def __init__(self, database_path: str):
+            super().__init__()
+            self.database_path = database_path
+
+        def execute(self, query: str) -> List[Dict[str, Any]]:
+            connection = sqlite3.connect(self.database_path)
+            connection.row_factory = sqlite3.Row
+            try:
+                return [dict(row) for row in connection.execute(query)]
+            finally:
+                connection.close()
+
+        async def get_data(self, query: str) -> List[Dict[str, Any]]:
+            query = MYSQL_INTERVAL_EXPRESSION.sub(r"datetime('now', '-\1 \2')", query)
+            return await asyncio.get_event_loop().run_in_executor(None, self.execute, query)
+
+    result = ScenarioResult('operator_command_burst')
+    directory = tempfile.mkdtemp()
+    try:
+        database_path = os.path.join(directory, 'operator.sqlite')
+        method_ids = seed_operator_database(database_path)
+        commands = ('/show_cancels', '/show_pendings', '/get_info')
+
+        new_event_loop()
+        with FakeTelegramServer(retry_after_every=flood_every) as server:
+            bot = SqliteOperatorHelperBot(database_path)
+            bot.register_handlers()
+            use_fake_server(bot, server)
+            updates = [
+                message_update(
+                    number + 1,
+                    OPERATORS_CHAT_ID,
+                    number % 5 + 1,
+                    f'{commands[number % len(commands)]} {method_ids[number % len(method_ids)]}'
+                )
+                for number in range(operations)
+            ]
+
+            async def scenario():
+                with Measurement(result, trace_memory):
+                    await process_updates(bot.dp, updates, concurrency, result)
+                result.extra['send_message_calls'] = server.calls['sendMessage']
+                await close_session(bot)
+
+            bot.loop.run_until_complete(scenario())
+    finally:
+        shutil.rmtree(directory)
+    return result
+
+
+def neural_signal_backlog(operations: int, concurrency: int, flood_every: int = 0,
+                          trace_memory: bool = False) -> ScenarioResult:
+    """
+    A mailbox backlog of unread newsletters, every episode is published to ``concurrency`` channels.
+    Speech synthesis and ffmpeg are replaced by writing a file of proportional size,
+    the scenario measures mail, ledger and Telegram handling around them
+    """
+    from neural_signal_bot import NeuralSignalBot
+
+    sender = 'daily@meduza.io'
+    channel_names = [f'channel_{number}' for number in range(1, concurrency + 1)]
+    result = ScenarioResult('neural_signal_backlog')
+
+    class LoadNeuralSignalBot(NeuralSignalBot):
+
+        def __init__(self, stub: ImapStub, server: FakeTelegramServer, directory: str):
+            super().__init__(FAKE_TOKEN, stub.username, stub.password, channel_names)
+            self.stub = stub
+            self.directory_name = directory
+            self.storage_name = os.path.join(directory, 'data.db')
+            self.ledger.path = os.path.join(directory, 'ledger.db')
+            self.telegram_base_url = server.base_url
+
+        def get_mail_client(self) -> StubGmailClient:
+            return StubGmailClient(self.stub)
+
+        def generate_audio(self, text: str, subject: str) -> str:
+            filename = self.get_filename(subject)
+            with open(filename, 'wb') as af:
+                af.write(b'\0' * (len(text) * 4))
+            return filename
+
+        def speed_up_audio(self, filename: str, tempo: float = 1.5) -> str:
+            compressed_filename = f"{filename[:-4]}_compressed.mp3"
+            os.replace(filename, compressed_filename)
+            return compressed_filename
+
+        def process_episode(self, raw_message: list):
+            started = time.perf_counter()
+            try:
+                super().process_episode(raw_message)
+            except Exception:
+                result.errors += 1
+                raise
+            finally:
+                result.latencies.append(time.perf_counter() - started)
+
+    directory = tempfile.mkdtemp()
+    try:
+        with ImapStub() as stub, FakeTelegramServer(retry_after_every=flood_every) as server:
+            for number in range(1, operations + 1):
+                stub.add_message(build_newsletter(number, sender))
+            for number, channel_name in enumerate(channel_names, start=1):
+                server.add_update(channel_post_update(number, -1000 - number, channel_name))
+
+            bot = LoadNeuralSignalBot(stub, server, directory)
+            with Measurement(result, trace_memory):
+                bot.process_unread_messages()
+
+            result.extra.update({
+                'imap_commands': stub.commands,
+                'imap_sent_mb': round(stub.sent_bytes / 2 ** 20, 2),
+                'telegram_uploaded_mb': round(server.uploaded_bytes / 2 ** 20, 2),
+                'send_audio_calls': server.calls['sendAudio'],
+                'unseen_left': sum(1 for m in stub.messages if '\\Seen' not in m.flags),
+            })
+    finally:
+        shutil.rmtree(directory)
+    return result
+
+
+SCENARIOS = {
+    'lifestat': lifestat_tap_storm,
+    'operator_helper': operator_command_burst,
+    'neural_signal': neural_signal_backlog,
+}
+
+
+def run_scenario(name: str, operations: int, concurrency: int, flood_every: int = 0,
+                 trace_memory: bool = False) -> Dict[str, Any]:
+    """Entry point for a scenario subprocess, returns the summary of the run"""
+    logging.disable(logging.CRITICAL)
+    summary = SCENARIOS[name](operations, concurrency, flood_every, trace_memory).summary()
+    summary.update({'concurrency': concurrency, 'flood_every': flood_every})
+    return summary
@@ -0,0 +1,81 @@
+"""
+Newsletter fixtures shared by the text cleaner benchmark and the load harness
+"""
+import quopri
+import random
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import make_msgid
+
+WORDS = (
+    'нейросеть', 'модель', 'данные', 'исследователи', 'компания', 'обучение', 'будущее',
+    'OpenAI', 'Google', 'GPT', 'сигнал', 'технологии', 'рассказываем', 'почему', 'это', 'важно'
+)
+LINKS = (
+    '(https://meduza.io/feature/2023/05/12/neyroseti-i-my)',
+    'https://www.nature.com/articles/s41586-023-06291-2?utm_source=signal&utm_medium=email',
+    '(mailto:signal@meduza.io?subject=Вопрос)',
+    'http://arxiv.org/abs/2305.10601',
+)
+
+
+def generate_newsletter(size: int, seed: int = 0) -> str:
+    rnd = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        line = ' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(5, 20)))
+        if rnd.random() < 0.3:
+            line += ' ' + rnd.choice(LINKS)
+        if rnd.random() < 0.1:
+            line = f'*{line}*'
+        parts.append(line + '.\r\n')
+        length += len(parts[-1])
+    parts.append('Будущее — это вы.\r\nОтписаться можно тут (https://getsignal.news/unsubscribe)\r\n')
+    return ''.join(parts)
+
+
+def generate_wrapped_html(size: int, seed: int = 0, width: int = 70) -> str:
+    """Html with paragraphs hard wrapped at ``width`` like most mail clients send them"""
+    rnd = random.Random(seed)
+    paragraphs = []
+    length = 0
+    while length < size:
+        lines = ['']
+        for _ in range(rnd.randint(10, 60)):
+            word = rnd.choice(WORDS)
+            if len(lines[-1]) + len(word) >= width:
+                lines.append('')
+            lines[-1] = f'{lines[-1]} {word}'.lstrip()
+        paragraph = '<p>' + rnd.choice(('\r\n', '\n', '\r\n  ')).join(lines) + '</p>'
+        paragraphs.append(paragraph)
+        length += len(paragraph)
+    return '<html><body>\r\n' + '\r\n'.join(paragraphs) + '\r\n</body></html>'
+
+
+def encode_subject(subject: str) -> str:
+    encoded = quopri.encodestring(subject.encode(), quotetabs=True).replace(b'=\n', b'')
+    return f'=?utf-8?Q?{encoded.decode()}?='
+
+
+def build_newsletter(number: int, sender: str, size: int = 30_000, attachment_size: int = 200_000) -> bytes:
+    """Newsletter shaped like a Signal issue: text and html alternatives plus an attachment"""
+    text = generate_newsletter(size, seed=number)
+    html_text = ''.join(f'<p>{line}</p>' for line in text.split('\r\n'))
+    alternative = MIMEMultipart('alternative')
+    alternative.attach(MIMEText(text, 'plain', 'utf-8'))
+    html_head = '<head><style type="text/css">p { margin: 0 }</style></head>'
+    alternative.attach(MIMEText(f'<html>{html_head}<body>{html_text}</body></html>', 'html', 'utf-8'))
+
+    message = MIMEMultipart('mixed')
+    message['From'] = f'Signal <{sender}>'
+    message['To'] = 'user@example.com'
+    message['Subject'] = encode_subject(f'#{number}. Выпуск номер {number}.')
+    message['Message-ID'] = make_msgid(idstring=str(number), domain='example.com')
+    message.attach(alternative)
+    if attachment_size:
+        attachment = MIMEApplication(random.Random(number).randbytes(attachment_size), 'octet-stream')
+        attachment.add_header('Content-Disposition', 'attachment', filename='image.bin')
+        message.attach(attachment)
+    return message.as_bytes().replace(b'\r\n', b'\n').replace(b'\n', b'\r\n')
@@ -0,0 +1,72 @@
+"""
+Cold start budget check for the bot entry points.
+Every bot module is imported in a fresh interpreter with ``-X importtime``,
+the run fails when the import is slower than the budget or pulls a module that must be imported lazily.
+Budgets are about 2x the slowest import times measured on Python 3.9.18 with requirements.txt installed
+(lifestat_bot ~415 ms, operator_helper_bot ~400 ms, neural_signal_bot ~210 ms), so a cold start
+regression of more than 2x fails on the slowest host seen and sooner on faster ones.
+Forbidden modules catch a heavy dependency of another bot imported at the top level.
+
+Usage: python -m benchmarks.startup_benchmark [bot name ...]
+"""
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+from bots import BASE_DIR, BOTS
+
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup_budget.json')
+RUNS = 5
+
+
+def measure_import(module_name: str) -> Tuple[float, Dict[str, int]]:
+    """Return cumulative import time of the module in ms and cumulative time of every imported module in us"""
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f'Import of {module_name} failed:\n{process.stderr}')
+    imported = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, package = line.split('|')
+        imported[package.strip()] = int(cumulative)
+    return imported[module_name] / 1000, imported
+
+
+def check_bot(bot_name: str, budget: dict) -> List[str]:
+    module_name = BOTS[bot_name]
+    timings = [measure_import(module_name) for _ in range(RUNS)]
+    import_time = min(timing for timing, _ in timings)
+    imported = timings[0][1]
+    print(f'{bot_name:<20} {import_time:8.1f} ms (budget {budget["import_time_ms"]} ms)')
+
+    errors = []
+    if import_time > budget['import_time_ms']:
+        errors.append(f'{bot_name} imports in {import_time:.1f} ms, budget is {budget["import_time_ms"]} ms')
+    for forbidden_module in budget.get('forbidden_modules', ()):
+        if forbidden_module in imported:
+            errors.append(f'{bot_name} imports {forbidden_module} at startup')
+    return errors
+
+
+def main(bot_names: List[str]):
+    with open(BUDGET_PATH) as budget_file:
+        budgets = json.load(budget_file)
+
+    errors = []
+    for bot_name in bot_names or sorted(BOTS):
+        errors.extend(check_bot(bot_name, budgets[bot_name]))
+    for error in errors:
+        print(error)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
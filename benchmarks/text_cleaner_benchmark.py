@@ -0,0 +1,111 @@
+"""
+Benchmark of NewsletterCleaner against the previous multi-pass implementation.
+
+Usage: python -m benchmarks.text_cleaner_benchmark
+"""
+import email
+import html
+import re
+import timeit
+
+from benchmarks.newsletters import build_newsletter, generate_newsletter, generate_wrapped_html
+from content.neural_signal_bot import END_PHRASES
+from lib.text_cleaner import NewsletterCleaner
+
+
+def legacy_clean(body: str) -> str:
+    body = body.replace('*', '')
+    body = body.replace('\n', '')
+    body = body.replace('\r', '')
+    body = re.sub(
+        r'\(?https?:\/\/(?:www\.)?[-a-zA-Z0-9@:\';∂%._\+~#=〈≷,!]{1,256}\.[a-zA-Z0-9()\';∂〈≷,!]{1,6}(?:[-a-zA-Z0-9()@:\';∂%_\+.~#?&\/=〈≷,!]*)', '', body)
+    body = re.sub(
+        r'\(mailto[-a-zA-Z0-9()@:\';∂%_\+.~#?&\/=〈≷,]*', '', body)
+    end_phrase = 'Будущее — это вы.'
+    end_phrase_position = body.find(end_phrase)
+    if end_phrase_position > 0:
+        body = body[:end_phrase_position+len(end_phrase)]
+    else:
+        alter_end_phrase = 'Отписаться можно тут'
+        alter_end_phrase_position = body.find(alter_end_phrase)
+        if alter_end_phrase_position > 0:
+            body = body[:alter_end_phrase_position + len(alter_end_phrase)]
+    return body
+
+
+def legacy_strip_html(text: str) -> str:
+    text = re.sub(r'<(script|style)\b[^>]*>[^<]*(?:<(?!/\1)[^<]*)*</\1\s*>', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'<[^<>]*>', ' ', text)
+    return html.unescape(text)
+
+
+def reference_strip_html(text: str) -> str:
+    # The legacy version glued words around line breaks, the cleaner collapses whitespace instead
+    return ' '.join(legacy_strip_html(text).split())
+
+
+def adversarial_inputs(size: int) -> dict:
+    return {
+        'undotted links': ('http://' + 'a' * 300 + ' ') * (size // 308),
+        'dotted links': 'https://' + 'a.' * (size // 2),
+        'open parentheses': '(' * size,
+        'mailto prefixes': '(mailto' * (size // 7),
+        'unclosed tags': '<a' * (size // 2),
+        'unclosed styles': '<style>' * (size // 7),
+        'unclosed scripts': '<script>x' * (size // 9),
+    }
+
+
+def measure(function, text: str, number: int = 5) -> float:
+    return min(timeit.repeat(lambda: function(text), number=1, repeat=number))
+
+
+def main():
+    cleaner = NewsletterCleaner(END_PHRASES)
+
+    print('Newsletters')
+    for size in (20_000, 50_000, 200_000):
+        text = generate_newsletter(size)
+        if cleaner.clean(text) != legacy_clean(text):
+            raise AssertionError(f'Output differs from legacy implementation for {size} chars')
+        legacy_time = measure(legacy_clean, text)
+        clean_time = measure(cleaner.clean, text)
+        print(f'  {size:>8} chars: legacy {legacy_time * 1000:8.2f} ms, '
+              f'cleaner {clean_time * 1000:8.2f} ms, x{legacy_time / clean_time:.1f}')
+
+    print('HTML newsletters')
+    for size in (20_000, 50_000, 200_000):
+        newsletter = email.message_from_bytes(build_newsletter(1, 'daily@meduza.io', size, attachment_size=0))
+        text = next(p for p in newsletter.walk() if p.get_content_type() == 'text/html').get_payload(decode=True).decode()
+        if cleaner.clean(text, is_html=True) != legacy_clean(reference_strip_html(text)):
+            raise AssertionError(f'HTML output differs from legacy implementation for {size} chars')
+        legacy_time = measure(lambda value: legacy_clean(legacy_strip_html(value)), text)
+        clean_time = measure(lambda value: cleaner.clean(value, is_html=True), text)
+        print(f'  {size:>8} chars: legacy {legacy_time * 1000:8.2f} ms, '
+              f'cleaner {clean_time * 1000:8.2f} ms, x{legacy_time / clean_time:.1f}')
+
+    print('Wrapped HTML paragraphs')
+    for seed in range(5):
+        text = generate_wrapped_html(20_000, seed=seed)
+        expected_words = legacy_strip_html(text).split()
+        if cleaner.clean(text, is_html=True).split() != expected_words:
+            raise AssertionError(f'Words glued across line breaks in wrapped HTML, seed {seed}')
+    print('  word boundaries kept')
+
+    # Linear time gives a ratio of about 8, quadratic about 64, the threshold leaves room for timer noise
+    print('Adversarial inputs (time for 8x input / time for 1x input, linear is about 8)')
+    base_size = 250_000
+    small_inputs = adversarial_inputs(base_size)
+    large_inputs = adversarial_inputs(base_size * 8)
+    for name in small_inputs:
+        is_html = name.startswith('unclosed')
+        small_time = measure(lambda text: cleaner.clean(text, is_html=is_html), small_inputs[name], 7)
+        large_time = measure(lambda text: cleaner.clean(text, is_html=is_html), large_inputs[name], 7)
+        ratio = large_time / small_time
+        print(f'  {name:<18} {small_time * 1000:8.2f} ms -> {large_time * 1000:8.2f} ms, ratio {ratio:.1f}')
+        if ratio > 24:
+            raise AssertionError(f'Superlinear cleaning time on {name}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Unified launcher for the bots, only the chosen bot module and its dependencies are imported.
+
+Usage: python -m bots <bot name>
+"""
+import importlib
+import os
+from typing import List, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BOTS = {
+    'lifestat_bot': 'lifestat_bot',
+    'neural_signal_bot': 'neural_signal_bot',
+    'operator_helper_bot': 'operator_helper_bot',
+}
+
+
+def run(bot_name: str):
+    import dotenv
+
+    dotenv.load_dotenv(
+        os.path.join(BASE_DIR, '.env'),
+        verbose=True
+    )
+    module = importlib.import_module(BOTS[bot_name])
+    module.main()
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m bots', description='Run one of the telegram bots')
+    parser.add_argument('bot_name', choices=sorted(BOTS))
+    args = parser.parse_args(argv)
+    run(args.bot_name)
@@ -0,0 +1,3 @@
+from bots import main
+
+main()
@@ -3,4 +3,10 @@ DISCLAIMER = '''Это озвученный компьютером выпуск
 Подписаться на рассылку можно тут - https://getsignal.news/
 Некоторые выпуски "Сигнала" Медуза выпускает в виде подкаста - там эпизоды озвучены человеком и нет артефактов, которые могут попадаться в этом канале.
 Подкаст можно найти по ссылке и на всех подкаст платформах - https://meduza.io/podcasts/signal/
-Поддержать Медузу деньгами можно тут - https://support.meduza.io/'''
\ No newline at end of file
+Поддержать Медузу деньгами можно тут - https://support.meduza.io/'''
+
+
+END_PHRASES = (
+    'Будущее — это вы.',
+    'Отписаться можно тут',
+)
@@ -0,0 +1,53 @@
+import dbm
+import pickle
+from typing import Any, Dict
+
+
+class EpisodeLedger:
+    """
+    Persistent record of processing stages keyed by mail Message-ID.
+    Each record is a dict holding the last completed ``stage`` and its artifacts,
+    artifacts only needed to resume an unfinished episode are dropped once it is published
+    """
+
+    PARSED = 'parsed'
+    AUDIO = 'audio'
+    PUBLISHED = 'published'
+
+    STAGES = (PARSED, AUDIO, PUBLISHED)
+    TRANSIENT_ARTIFACTS = ('text', 'audio_path')
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @staticmethod
+    def get_key(message_id: str) -> str:
+        return f'episode:{message_id}'
+
+    def get(self, message_id: str) -> Dict[str, Any]:
+        with dbm.open(self.path, 'c') as db:
+            record = db.get(self.get_key(message_id))
+        if not record:
+            return {}
+        return pickle.loads(record)
+
+    def update(self, message_id: str, stage: str, **artifacts) -> Dict[str, Any]:
+        if stage not in self.STAGES:
+            raise ValueError(f'Unknown stage {stage}')
+        key = self.get_key(message_id)
+        with dbm.open(self.path, 'c') as db:
+            record = db.get(key)
+            record = pickle.loads(record) if record else {}
+            record.update(artifacts)
+            record['stage'] = stage
+            if stage == self.PUBLISHED:
+                for artifact in self.TRANSIENT_ARTIFACTS:
+                    record.pop(artifact, None)
+            db[key] = pickle.dumps(record)
+        return record
+
+    def is_completed(self, message_id: str, stage: str) -> bool:
+        record = self.get(message_id)
+        if 'stage' not in record:
+            return False
+        return self.STAGES.index(record['stage']) >= self.STAGES.index(stage)
@@ -1,14 +1,32 @@
 import imaplib
 import logging
-from typing import List, Tuple, Optional
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional, Union
+
+FETCH_START_EXPRESSION = re.compile(rb'^\d+ \(')
+FETCH_UID_EXPRESSION = re.compile(rb'UID (\d+)')
+FETCH_SECTION_EXPRESSION = re.compile(rb'(RFC822|BODY\[[^\]]*\](?:<\d+>)?) \{\d+\}$')
+BODYSTRUCTURE_TOKEN_EXPRESSION = re.compile(rb'\(|\)|"(?:[^"\\]|\\.)*"|\{\d+\}|[^\s()"]+')
+
+HEADER_FIELDS = 'HEADER.FIELDS (SUBJECT MESSAGE-ID)'
+
+
+@dataclass
+class FetchedMessage:
+    uid: bytes
+    meta: bytes = b''
+    sections: Dict[str, bytes] = field(default_factory=dict)
+    structure: Optional[list] = None
 
 
 class GmailClient:
 
-    def __init__(self, username: str, password: str):
+    def __init__(self, username: str, password: str, batch_size: int = 50):
         self.imap_server = 'imap.gmail.com'
         self.email = username
         self.password = password
+        self.batch_size = batch_size
         self.connection = self.get_connection()
 
     def get_connection(self):
@@ -18,29 +36,168 @@ class GmailClient:
         return connection
 
     def search(self, key: str, val: str):
-        result, data = self.connection.search(None, key, '"{}"'.format(val))
+        result, data = self.connection.uid('SEARCH', None, key, '"{}"'.format(val))
         return data
 
-    def get_messages(self, search_result: List[bytes]):
+    @staticmethod
+    def get_message_set(uids: Iterable[bytes]) -> str:
+        """Collapse uids into an IMAP message set, e.g. ``1:3,7``"""
+        numbers = sorted({int(uid) for uid in uids})
+        ranges = []
+        for number in numbers:
+            if ranges and ranges[-1][1] == number - 1:
+                ranges[-1][1] = number
+            else:
+                ranges.append([number, number])
+        return ','.join(str(start) if start == end else f'{start}:{end}' for start, end in ranges)
+
+    def iter_batches(self, uids: List[bytes]) -> Iterator[List[bytes]]:
+        for position in range(0, len(uids), self.batch_size):
+            yield uids[position:position + self.batch_size]
+
+    @staticmethod
+    def parse_fetch_response(data: List[Union[bytes, Tuple[bytes, bytes]]]) -> List[FetchedMessage]:
+        messages = []
+        for item in data:
+            if item is None:
+                continue
+            head = item[0] if isinstance(item, tuple) else item
+            if FETCH_START_EXPRESSION.match(head) or not messages:
+                messages.append(FetchedMessage(uid=b''))
+            message = messages[-1]
+            message.meta += head
+            if isinstance(item, tuple):
+                section = FETCH_SECTION_EXPRESSION.search(head)
+                if section:
+                    message.sections[section.group(1).decode()] = item[1]
+        for message in messages:
+            uid = FETCH_UID_EXPRESSION.search(message.meta)
+            if uid:
+                message.uid = uid.group(1)
+            if b'BODYSTRUCTURE' in message.meta:
+                message.structure = GmailClient.parse_bodystructure(message.meta)
+        return messages
+
+    @staticmethod
+    def parse_bodystructure(meta: bytes) -> Optional[list]:
+        position = meta.find(b'BODYSTRUCTURE')
+        if position < 0:
+            return None
+        stack = [[]]
+        for token in BODYSTRUCTURE_TOKEN_EXPRESSION.findall(meta[position + len(b'BODYSTRUCTURE'):]):
+            if token == b'(':
+                stack.append([])
+            elif token == b')':
+                if len(stack) == 1:
+                    break
+                closed = stack.pop()
+                stack[-1].append(closed)
+                if len(stack) == 1:
+                    break
+            elif token.startswith(b'"'):
+                stack[-1].append(re.sub(rb'\\(.)', rb'\1', token[1:-1]).decode(errors='replace'))
+            elif token.upper() == b'NIL':
+                stack[-1].append(None)
+            else:
+                stack[-1].append(token.decode(errors='replace'))
+        return stack[0][0] if stack[0] else None
+
+    @staticmethod
+    def find_text_part(structure: list, subtype: str = 'plain', prefix: str = '') -> Optional[str]:
+        """Return the section number of the first text/<subtype> part of a multipart structure"""
+        if not structure or not isinstance(structure[0], list):
+            return None
+        children = []
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            children.append(child)
+        for index, child in enumerate(children, start=1):
+            section = f'{prefix}{index}'
+            if isinstance(child[0], list):
+                nested = GmailClient.find_text_part(child, subtype, f'{section}.')
+                if nested:
+                    return nested
+            elif str(child[0]).lower() == 'text' and str(child[1]).lower() == subtype:
+                return section
+        return None
+
+    def fetch(self, uids: List[bytes], message_parts: str) -> List[FetchedMessage]:
         result = []
-        search_result = search_result[0].split()
-        for num in search_result:
+        for batch in self.iter_batches(uids):
             try:
-                typ, data = self.connection.fetch(num, '(RFC822)')
-                result.append(data)
+                typ, data = self.connection.uid('FETCH', self.get_message_set(batch), message_parts)
+                result.extend(self.parse_fetch_response(data))
             except Exception as err:
                 logging.exception(err)
+        return result
 
+    def get_messages(self, search_result: List[bytes]):
+        result = []
+        uids = search_result[0].split()
+        for message in self.fetch(uids, '(UID RFC822)'):
+            if 'RFC822' in message.sections:
+                result.append([(message.meta, message.sections['RFC822'])])
         return result
 
-    def get_all_from_sender(self, sender: str) -> Optional[List[Tuple[bytes]]]:
-        messages = self.get_messages(self.search('FROM', sender))
-        return messages
+    def get_text_messages(self, search_result: List[bytes]):
+        """
+        Fetch only the subject, message id and the first text part of each message.
+        Messages are not marked as seen, use ``mark_seen`` after processing
+        """
+        uids = search_result[0].split()
+        sections = {}
+        for message in self.fetch(uids, '(UID BODYSTRUCTURE)'):
+            section = self.find_text_part(message.structure) or self.find_text_part(message.structure, 'html')
+            sections.setdefault(section, []).append(message.uid)
 
-    def get_unseen_from_sender(self, sender: str) -> Optional[List[Tuple[bytes]]]:
-        messages = self.get_messages(self.search('UNSEEN FROM', sender))
-        return messages
+        fetched = {}
+        for section, section_uids in sections.items():
+            if section is None:
+                message_parts = '(UID BODY.PEEK[])'
+            else:
+                message_parts = f'(UID BODY.PEEK[{HEADER_FIELDS}] BODY.PEEK[{section}.MIME] BODY.PEEK[{section}])'
+            for message in self.fetch(section_uids, message_parts):
+                if section is None:
+                    raw = message.sections.get('BODY[]')
+                else:
+                    headers = message.sections.get(f'BODY[{HEADER_FIELDS}]', b'').rstrip(b'\r\n')
+                    mime_headers = message.sections.get(f'BODY[{section}.MIME]') or b'\r\n'
+                    body = message.sections.get(f'BODY[{section}]')
+                    raw = None if body is None else headers + b'\r\n' + mime_headers + body
+                if raw is not None:
+                    fetched[int(message.uid)] = [(message.meta, raw)]
+
+        return [fetched[uid] for uid in sorted(fetched)]
+
+    def mark_seen(self, uids: Iterable[bytes]):
+        uids = list(uids)
+        for batch in self.iter_batches(uids):
+            message_set = self.get_message_set(batch)
+            try:
+                self.connection.uid('STORE', message_set, '+FLAGS', '(\\Seen)')
+            except imaplib.IMAP4.abort:
+                # Connection may be dropped by the server while long processing
+                self.connection = self.get_connection()
+                self.connection.uid('STORE', message_set, '+FLAGS', '(\\Seen)')
+
+    @staticmethod
+    def get_uid(message: list) -> Optional[bytes]:
+        uid = FETCH_UID_EXPRESSION.search(message[0][0])
+        return uid.group(1) if uid else None
+
+    def get_all_from_sender(self, sender: str, text_only: bool = False) -> Optional[List[Tuple[bytes]]]:
+        search_result = self.search('FROM', sender)
+        if text_only:
+            return self.get_text_messages(search_result)
+        return self.get_messages(search_result)
+
+    def get_unseen_from_sender(self, sender: str, text_only: bool = False) -> Optional[List[Tuple[bytes]]]:
+        search_result = self.search('UNSEEN FROM', sender)
+        if text_only:
+            return self.get_text_messages(search_result)
+        return self.get_messages(search_result)
 
-    def get_last_unseen_from_sender(self, sender: str) -> Optional[List[Tuple[bytes]]]:
-        messages = self.get_unseen_from_sender(sender=sender)
+    def get_last_unseen_from_sender(self, sender: str, text_only: bool = False) -> Optional[List[Tuple[bytes]]]:
+        messages = self.get_unseen_from_sender(sender=sender, text_only=text_only)
         return messages[-1]
@@ -0,0 +1,78 @@
+import html
+import re
+from typing import Sequence
+
+REMOVED_CHARS = ('*', '\n', '\r')
+URL_CHARS = r"-a-zA-Z0-9()@:';∂%_+.~#?&/=〈≷,!"
+MAILTO_CHARS = r"-a-zA-Z0-9()@:';∂%_+.~#?&/=〈≷,"
+
+
+class NewsletterCleaner:
+    """
+    Prepare newsletter text for speech synthesis.
+    Links are removed in a single regex pass, every alternative is one character class run,
+    so matching is linear in the text length
+    """
+
+    # Each alternative starts with a fixed character, which lets the regex engine
+    # skip plain text with a fast first-character scan
+    LINK_EXPRESSION = re.compile(
+        rf'https?://[{URL_CHARS}]*'
+        rf'|\((?:https?://[{URL_CHARS}]*|mailto[{MAILTO_CHARS}]*)'
+    )
+    HTML_BLOCK_START_EXPRESSION = re.compile(r'<(script|style)\b', re.IGNORECASE)
+    HTML_BLOCK_END_EXPRESSIONS = {
+        'script': re.compile(r'</script\s*>', re.IGNORECASE),
+        'style': re.compile(r'</style\s*>', re.IGNORECASE),
+    }
+    HTML_TAG_EXPRESSION = re.compile(r'<[^<>]*>')
+
+    def __init__(self, end_phrases: Sequence[str] = ()):
+        self.end_phrases = end_phrases
+
+    def strip_blocks(self, text: str) -> str:
+        """
+        Remove script and style blocks in one forward scan.
+        An unclosed block runs to the end of the text, so nothing is scanned twice
+        """
+        parts = []
+        position = 0
+        while True:
+            start = self.HTML_BLOCK_START_EXPRESSION.search(text, position)
+            if start is None:
+                parts.append(text[position:])
+                break
+            parts.append(text[position:start.start()])
+            end = self.HTML_BLOCK_END_EXPRESSIONS[start.group(1).lower()].search(text, start.end())
+            if end is None:
+                break
+            position = end.end()
+        return ''.join(parts)
+
+    def strip_html(self, text: str) -> str:
+        """
+        Remove markup and collapse whitespace runs to one space.
+        A line break in html separates words, removing it later without a space would glue them
+        """
+        text = self.strip_blocks(text)
+        text = self.HTML_TAG_EXPRESSION.sub(' ', text)
+        text = html.unescape(text)
+        # str.split without arguments splits on whitespace runs and is much faster than a regex
+        return ' '.join(text.split())
+
+    def cut_ending(self, text: str) -> str:
+        """Cut the text after the first end phrase found, phrases are checked in priority order"""
+        for end_phrase in self.end_phrases:
+            end_phrase_position = text.find(end_phrase)
+            if end_phrase_position > 0:
+                return text[:end_phrase_position + len(end_phrase)]
+        return text
+
+    def clean(self, text: str, is_html: bool = False) -> str:
+        if is_html:
+            text = self.strip_html(text)
+        # Plain str.replace is much faster than a regex for single characters
+        for char in REMOVED_CHARS:
+            text = text.replace(char, '')
+        text = self.LINK_EXPRESSION.sub('', text)
+        return self.cut_ending(text)
@@ -4,7 +4,6 @@ import pickle
 from dataclasses import dataclass, field
 from typing import Dict
 
-import dotenv
 from aiogram import Bot, types, Dispatcher
 from aiogram.contrib.fsm_storage.redis import RedisStorage2
 from aiogram.dispatcher import FSMContext
@@ -242,7 +241,7 @@ class LifeStatBot:
         await message.answer('Unknown command')
         await self.start_handle(message)
 
-    def start(self):
+    def register_handlers(self):
 
         # Commands
         self.dp.register_message_handler(self.start_handle, commands='start')
@@ -264,11 +263,21 @@ class LifeStatBot:
         # Default
         self.dp.register_message_handler(self.default_handle, regexp='.')
 
+    def start(self):
+        self.register_handlers()
+
         # Run bot
         executor.start_polling(self.dp, loop=self.loop, skip_updates=True)
 
 
+def main():
+    bot = LifeStatBot()
+
+    bot.start()
+
+
 if __name__ == '__main__':
+    import dotenv
 
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -276,7 +285,4 @@ if __name__ == '__main__':
         os.path.join(BASE_DIR, '.env'),
         verbose=True
     )
-
-    bot = LifeStatBot()
-
-    bot.start()
+    main()
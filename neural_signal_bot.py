@@ -1,23 +1,25 @@
 import os
 import logging
-import dotenv
-from typing import List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from io import StringIO
-from gtts import gTTS
 import email
+import hashlib
+from email.parser import BytesHeaderParser
 import quopri
 import re
 from time import sleep
 import subprocess
 import asyncio
 import pickle
-
-from tqdm import tqdm
-from telegram import Bot
 import dbm
 
-from content.neural_signal_bot import DISCLAIMER
+from content.neural_signal_bot import DISCLAIMER, END_PHRASES
+from lib.episode_ledger import EpisodeLedger
 from lib.gmail_client import GmailClient
+from lib.text_cleaner import NewsletterCleaner
+
+if TYPE_CHECKING:
+    from telegram import Bot
 
 os.environ.setdefault('PYDEVD_WARN_EVALUATION_TIMEOUT', str(60 * 2))
 
@@ -30,23 +32,43 @@ logger = logging.getLogger('telegram_bot.neural_signal_bot')
 
 
 class NeuralSignalBot:
-    def __init__(self, telegram_api_token: str, mail_username: str, mail_password: str, channel_name: str):
+    def __init__(self, telegram_api_token: str, mail_username: str, mail_password: str, channel_names: List[str]):
+        if not channel_names:
+            raise ValueError("No telegram channels configured, set NEURAL_SIGNAL_CHANNEL")
         self.telegram_api_token = telegram_api_token
         self.mail_username = mail_username
         self.mail_password = mail_password
-        self.channel_name = channel_name
+        self.channel_names = channel_names
+        self.channel_ids = {}
+        self.telegram_base_url = 'https://api.telegram.org/bot'
 
         self.sender_address = 'daily@meduza.io'
         self.directory_name = 'data'
+        self.storage_name = os.path.join(self.directory_name, 'data.db')
+        self.ledger = EpisodeLedger(os.path.join(self.directory_name, 'ledger.db'))
+        self.text_cleaner = NewsletterCleaner(END_PHRASES)
 
-    def get_unread_messages(self) -> List[list]:
-        mail_client = GmailClient(
+    def get_mail_client(self) -> GmailClient:
+        return GmailClient(
             username=self.mail_username,
             password=self.mail_password
         )
-        mails = mail_client.get_unseen_from_sender(sender=self.sender_address)
+
+    def get_unread_messages(self, mail_client: GmailClient) -> List[list]:
+        mails = mail_client.get_unseen_from_sender(sender=self.sender_address, text_only=True)
         return mails
 
+    @staticmethod
+    def get_message_id(message: list) -> str:
+        headers = BytesHeaderParser().parsebytes(message[0][1])
+        message_id = headers['message-id'] or headers['subject']
+        if message_id and message_id.strip():
+            return message_id.strip()
+        uid = GmailClient.get_uid(message)
+        if uid:
+            return f'uid:{uid.decode()}'
+        return f'sha1:{hashlib.sha1(message[0][1]).hexdigest()}'
+
     def get_filename(self, subject: str) -> str:
         filename = f"signal_{subject}.mp3"
         filename = os.path.join(self.directory_name, filename)
@@ -60,27 +82,16 @@ class NeuralSignalBot:
             subject = subject.replace('\xa0', ' ')
         filename = self.get_filename(subject)
         print(f'Start upload episode - {subject}')
-        body = message.get_payload()[0].get_payload(decode=True).decode()
-        body = body.replace('*', '')
-        body = body.replace('\n', '')
-        body = body.replace('\r', '')
-        body = re.sub(
-            r'\(?https?:\/\/(?:www\.)?[-a-zA-Z0-9@:\';∂%._\+~#=〈≷,!]{1,256}\.[a-zA-Z0-9()\';∂〈≷,!]{1,6}(?:[-a-zA-Z0-9()@:\';∂%_\+.~#?&\/=〈≷,!]*)', '', body)
-        body = re.sub(
-            r'\(mailto[-a-zA-Z0-9()@:\';∂%_\+.~#?&\/=〈≷,]*', '', body)
-        end_phrase = 'Будущее — это вы.'
-        end_phrase_position = body.find(end_phrase)
-        if end_phrase_position > 0:
-            body = body[:end_phrase_position+len(end_phrase)]
-        else:
-            alter_end_phrase = 'Отписаться можно тут'
-            alter_end_phrase_position = body.find(alter_end_phrase)
-            if alter_end_phrase_position > 0:
-                body = body[:alter_end_phrase_position + len(alter_end_phrase)]
+        text_part = message.get_payload()[0] if message.is_multipart() else message
+        body = text_part.get_payload(decode=True).decode()
+        body = self.text_cleaner.clean(body, is_html=text_part.get_content_type() == 'text/html')
 
         return body, subject
 
     def generate_audio(self, text: str, subject: str) -> str:
+        from gtts import gTTS
+        from tqdm import tqdm
+
         sio = StringIO(text)
         audios = []
         chunk = sio.read(5000)
@@ -107,39 +118,171 @@ class NeuralSignalBot:
         os.remove(filename)
         return compressed_filename
     
-    async def get_channel_id(self, channel_name: str) -> Optional[int]:
-        bot = Bot(token=self.telegram_api_token)
-        async with bot:
-            updates = await bot.get_updates()
-            comparable_channel_names = [u.channel_post.chat for u in updates if u.channel_post]
-            comparable_channel_ids = [c.id for c in comparable_channel_names if c.username == channel_name]
-            if comparable_channel_ids:
-                channel_id = next(iter(comparable_channel_ids))
-                return channel_id
-            return 
-
-    async def send_telegram_message(self, message: str, audiofile_name: str):
-        
-        bot = Bot(token=self.telegram_api_token)
-        async with bot:
-            with dbm.open('data/data.db', 'c') as db:
+    async def get_channel_ids(self, bot: 'Bot', channel_names: List[str]) -> Dict[str, int]:
+        """Resolve all channel names from a single getUpdates response"""
+        updates = await self.call_with_retry(bot.get_updates)
+        channel_ids = {}
+        for update in updates:
+            if not update.channel_post:
+                continue
+            chat = update.channel_post.chat
+            if chat.username in channel_names and chat.username not in channel_ids:
+                channel_ids[chat.username] = chat.id
+        return channel_ids
+
+    def get_stored_channel_id(self, channel_name: str) -> Optional[int]:
+        with dbm.open(self.storage_name, 'c') as db:
+            channel_id = db.get(f'channel_id:{channel_name}')
+            # Single channel setups stored the id under the legacy key
+            if not channel_id and channel_name == self.channel_names[0]:
                 channel_id = db.get('channel_id')
-            if not channel_id:
-                channel_id = await self.get_channel_id(self.channel_name)
-                with dbm.open('data/data.db', 'c') as db:
-                    db['channel_id'] = pickle.dumps(channel_id)
-            else:
-                channel_id = pickle.loads(channel_id)
-            audio_title_expression = re.compile(r'signal_#\d+. (?P<title>[A-Za-zА-Яа-я «»!?0-9]+).')
-            audio_title = audio_title_expression.search(audiofile_name).group('title')
+        # Earlier versions stored a failed lookup as pickled None, it is a miss as well
+        return pickle.loads(channel_id) if channel_id else None
+
+    async def get_cached_channel_ids(self, bot: 'Bot') -> Dict[str, int]:
+        """Return ids of the configured channels found in memory, storage or bot updates"""
+        for channel_name in self.channel_names:
+            if channel_name not in self.channel_ids:
+                channel_id = self.get_stored_channel_id(channel_name)
+                if channel_id is not None:
+                    self.channel_ids[channel_name] = channel_id
+
+        pending_channel_names = [c for c in self.channel_names if c not in self.channel_ids]
+        if pending_channel_names:
+            found_channel_ids = await self.get_channel_ids(bot, pending_channel_names)
+            with dbm.open(self.storage_name, 'c') as db:
+                for channel_name, channel_id in found_channel_ids.items():
+                    db[f'channel_id:{channel_name}'] = pickle.dumps(channel_id)
+            self.channel_ids.update(found_channel_ids)
+        return {c: self.channel_ids[c] for c in self.channel_names if c in self.channel_ids}
+
+    @staticmethod
+    async def call_with_retry(request: Callable[[], Awaitable[Any]], attempts: int = 5,
+                              idempotent: bool = True) -> Any:
+        """
+        Retry a Telegram request on flood control and network errors.
+        Requests that are not idempotent should pass idempotent=False, after a timeout or a dropped
+        connection Telegram may still have accepted them, so only flood control is retried
+        """
+        from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+        for attempt in range(1, attempts + 1):
+            try:
+                return await request()
+            except (BadRequest, Forbidden):
+                # BadRequest subclasses NetworkError, but retrying it can't help
+                raise
+            except RetryAfter as err:
+                if attempt == attempts:
+                    raise
+                logger.warning(f"Flood control exceeded, retry in {err.retry_after} seconds")
+                await asyncio.sleep(err.retry_after)
+            except NetworkError as err:
+                # TimedOut subclasses NetworkError
+                if not idempotent or attempt == attempts:
+                    raise
+                delay = 2 ** attempt
+                logger.warning(f"Telegram request failed with {err}, retry in {delay} seconds")
+                await asyncio.sleep(delay)
+
+    async def send_telegram_message(self, bot: 'Bot', chat_id: int, message: str, audiofile_name: str,
+                                    file_id: Optional[str] = None) -> str:
+        """Send the episode audio, reusing an already uploaded file when file_id is known"""
+        audio_title_expression = re.compile(r'signal_#\d+. (?P<title>[A-Za-zА-Яа-я «»!?0-9]+).')
+        audio_title = audio_title_expression.search(audiofile_name).group('title')
+
+        async def send_audio():
+            if file_id:
+                return await bot.send_audio(chat_id=chat_id, title=audio_title, audio=file_id, caption=message)
             with open(audiofile_name, 'rb') as af:
-                await bot.send_audio(
-                    chat_id=channel_id,
-                    title=audio_title,
-                    audio=af,
-                    caption=message
+                return await bot.send_audio(chat_id=chat_id, title=audio_title, audio=af, caption=message)
+
+        # A failed upload may have been posted already, so it is not repeated,
+        # the next run resumes from the ledger
+        sent_message = await self.call_with_retry(send_audio, idempotent=bool(file_id))
+        return sent_message.audio.file_id
+
+    async def publish_episode(self, message_id: str, episode: Dict[str, Any]):
+        from telegram import Bot
+
+        bot = Bot(token=self.telegram_api_token, base_url=self.telegram_base_url)
+        await self.call_with_retry(bot.initialize)
+        try:
+            cached_channel_ids = await self.get_cached_channel_ids(bot)
+            missing_channel_names = [c for c in self.channel_names if c not in cached_channel_ids]
+            if missing_channel_names:
+                raise RuntimeError(f"Channels {', '.join(missing_channel_names)} not found in bot updates")
+            channel_ids = [cached_channel_ids[c] for c in self.channel_names]
+
+            audio_path = episode['audio_path']
+            file_id = episode.get('file_id')
+            published_chat_ids = set(episode.get('published_chat_ids', ()))
+            pending_chat_ids = [c for c in channel_ids if c not in published_chat_ids]
+
+            # Upload the file once, the other channels get it by file_id
+            if pending_chat_ids and not file_id:
+                chat_id = pending_chat_ids.pop(0)
+                file_id = await self.send_telegram_message(bot, chat_id, DISCLAIMER, audio_path)
+                published_chat_ids.add(chat_id)
+                self.ledger.update(
+                    message_id, EpisodeLedger.AUDIO, file_id=file_id, published_chat_ids=published_chat_ids
                 )
-            os.remove(audiofile_name)
+
+            results = await asyncio.gather(
+                *(self.send_telegram_message(bot, c, DISCLAIMER, audio_path, file_id) for c in pending_chat_ids),
+                return_exceptions=True
+            )
+            errors = []
+            for chat_id, result in zip(pending_chat_ids, results):
+                if isinstance(result, Exception):
+                    errors.append(result)
+                else:
+                    published_chat_ids.add(chat_id)
+
+            if errors:
+                self.ledger.update(message_id, EpisodeLedger.AUDIO, published_chat_ids=published_chat_ids)
+                raise errors[0]
+            if not published_chat_ids:
+                raise RuntimeError(f"Episode {message_id} was not sent to any channel")
+            self.ledger.update(message_id, EpisodeLedger.PUBLISHED, published_chat_ids=published_chat_ids)
+            if os.path.exists(audio_path):
+                os.remove(audio_path)
+        finally:
+            await bot.shutdown()
+
+    def process_episode(self, raw_message: list):
+        message_id = self.get_message_id(raw_message)
+        episode = self.ledger.get(message_id)
+        if self.ledger.is_completed(message_id, EpisodeLedger.PUBLISHED):
+            logger.info(f"Episode {episode['subject']} already published, skipping")
+            return
+
+        if not self.ledger.is_completed(message_id, EpisodeLedger.PARSED):
+            result = self.process_message(raw_message)
+            if result is None:
+                raise RuntimeError(f"Error while processing message {message_id}")
+            prepared_message, subject = result
+            episode = self.ledger.update(message_id, EpisodeLedger.PARSED, text=prepared_message, subject=subject)
+
+        audio_path = episode.get('audio_path')
+        if not episode.get('file_id') and (not audio_path or not os.path.exists(audio_path)):
+            audiofile_name = self.generate_audio(episode['text'], episode['subject'])
+            audio_path = self.speed_up_audio(audiofile_name)
+            episode = self.ledger.update(message_id, EpisodeLedger.AUDIO, audio_path=audio_path)
+
+        asyncio.run(self.publish_episode(message_id, episode))
+
+    def process_unread_messages(self):
+        mail_client = self.get_mail_client()
+        unreed_messages = self.get_unread_messages(mail_client)
+        if unreed_messages:
+            for raw_message in unreed_messages:
+                try:
+                    self.process_episode(raw_message)
+                except Exception as err:
+                    logger.exception(err)
+                    continue
+                mail_client.mark_seen([mail_client.get_uid(raw_message)])
 
     def start(self):
         logger.info(f"Starting bot")
@@ -147,18 +290,7 @@ class NeuralSignalBot:
             os.mkdir(self.directory_name)
         
         while True:
-            unreed_messages = self.get_unread_messages()
-            if unreed_messages:
-                for raw_message in unreed_messages:
-                    result = self.process_message(raw_message)
-                    if result is None:
-                        logging.exception(f"Error while processing message")
-                        continue
-                    prepared_message, subject = result
-                    audiofile_name = self.generate_audio(prepared_message, subject)
-                    compressed_audiofile_name = self.speed_up_audio(
-                        audiofile_name)
-                    asyncio.run(self.send_telegram_message(DISCLAIMER, compressed_audiofile_name))
+            self.process_unread_messages()
             logger.info(f"Sleeping for 1 hour")
             sleep(3600)
 
@@ -166,7 +298,7 @@ class NeuralSignalBot:
 def main():
 
     TELEGRAM_API_TOKEN = os.environ.get('NEURAL_SIGNAL_BOT_TOKEN')
-    TELEGRAM_CHANNEL_NAME = os.environ.get('NEURAL_SIGNAL_CHANNEL')
+    TELEGRAM_CHANNEL_NAMES = os.environ.get('NEURAL_SIGNAL_CHANNEL', '').split(',')
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
 
@@ -175,7 +307,7 @@ def main():
         telegram_api_token=TELEGRAM_API_TOKEN,
         mail_username=MAIL_USERNAME,
         mail_password=MAIL_PASSWORD,
-        channel_name=TELEGRAM_CHANNEL_NAME
+        channel_names=[channel_name.strip() for channel_name in TELEGRAM_CHANNEL_NAMES if channel_name.strip()]
     )
 
     # Start the bot
@@ -183,6 +315,8 @@ def main():
 
 
 if __name__ == '__main__':
+    import dotenv
+
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
     dotenv.load_dotenv(
@@ -3,15 +3,10 @@ import os
 from sqlite3 import OperationalError
 from typing import Any, List, Dict
 
-import dotenv
 from aiogram import Bot, types, Dispatcher
 from aiogram.contrib.fsm_storage.memory import MemoryStorage
 from aiogram.dispatcher.filters.state import StatesGroup, State
 from aiogram.utils import executor
-from async_lru import alru_cache
-from sqlalchemy import text
-from sqlalchemy.ext.asyncio import create_async_engine
-from tabulate import tabulate
 
 from content.operator_helper_bot import Messages
 
@@ -52,6 +47,9 @@ class OperatorHelperBot:
         return True
 
     async def get_data(self, query: str) -> List[Dict[str, Any]]:
+        from sqlalchemy import text
+        from sqlalchemy.ext.asyncio import create_async_engine
+
         mysql_username = os.environ.get('MYSQL_USERNAME')
         mysql_password = os.environ.get('MYSQL_PASSWORD')
         mysql_host = os.environ.get('MYSQL_HOST')
@@ -122,6 +120,8 @@ class OperatorHelperBot:
             LIMIT 10
             '''
             try:
+                from tabulate import tabulate
+
                 result = await self.get_data(query)
                 result_message = tabulate(
                     [(row['dt'], row["id"], row["pid"], row["cancel_reason_code"]) for row in result],
@@ -156,6 +156,8 @@ class OperatorHelperBot:
             LIMIT 20, 10
             '''
             try:
+                from tabulate import tabulate
+
                 result = await self.get_data(query)
                 result_message = tabulate(
                     [(row["dt"], row["id"]) for row in result],
@@ -221,7 +223,7 @@ class OperatorHelperBot:
     async def default_handle(self, message: types.Message):
         ...
 
-    def start(self):
+    def register_handlers(self):
 
         # Commands
         self.dp.register_message_handler(self.show_cancels, commands=['show_cancels'])
@@ -232,18 +234,26 @@ class OperatorHelperBot:
         # Default
         self.dp.register_message_handler(self.default_handle, regexp='.')
 
+    def start(self):
+        self.register_handlers()
+
         # Run bot
         executor.start_polling(self.dp, loop=self.loop, skip_updates=True)
 
 
+def main():
+    bot = OperatorHelperBot()
+
+    bot.start()
+
+
 if __name__ == '__main__':
+    import dotenv
+
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
     dotenv.load_dotenv(
         os.path.join(BASE_DIR, '.env'),
         verbose=True
     )
-
-    bot = OperatorHelperBot()
-
-    bot.start()
+    main()